@@ -1,30 +1,187 @@
 from collections import defaultdict
+from concurrent.futures import Executor, ThreadPoolExecutor
+from enum import StrEnum
+from functools import partial
+from itertools import chain
+import json
+import logging
+import mmap
+import os
 from pathlib import Path
 import re
-from typing import cast, DefaultDict, Optional, TypeAlias
+from typing import cast, DefaultDict, Iterator, Optional, TypeAlias
 
 
+log = logging.getLogger(__name__)
+
 # Artifact is any location you want to parse in your files.
 Artifact: TypeAlias = str
 DependencyGraph = DefaultDict[Artifact, list[Artifact]]
 
 
-def _get_dependencies(sql: str) -> list[Artifact]:
+class Relationship(StrEnum):
+    """Direction of the relationship, see `create_dependency_graph`."""
+
+    PARENT = "parent"
+    DEPENDENCY = "dependency"
+
+
+# Maps each artifact to the (st_mtime_ns, st_size, dependencies) of its sql
+# file when it was last parsed.
+DependencyCache: TypeAlias = dict[Artifact, tuple[int, int, list[Artifact]]]
+
+try:
+    # re2 guarantees linear time matching, see https://github.com/google/re2.
+    import re2 as _regex_engine
+except ModuleNotFoundError:
+    # re2 is optional. The pattern below avoids backtracking in `re` anyway.
+    _regex_engine = re
+
+
+# Note: supports only artifacts surrounded by " or `. Most warehouses
+# support one of these.
+_DEPENDENCY_RE = _regex_engine.compile(
+    rb'(?i)\b(?:FROM|TABLE|INTO|JOIN|UPDATE|DELETE)\s+[`"]([^`"\n]*)[`"]'
+)
+# Reading sql files is I/O bound, so use more threads than cores.
+_MAX_WORKERS: int = min(32, (os.cpu_count() or 1) * 4)
+# Most sql files each thread reads and scans in one batch.
+_MAX_BATCH_SIZE = 64
+# Sql files at least this large are memory mapped rather than copied into
+# memory. Smaller files are faster to read. The re2 binding cannot scan a
+# memory map, only str and bytes.
+_MMAP_MIN_SIZE: Optional[int] = 1 << 20 if _regex_engine is re else None
+# Written to the top of `sql_dir`. Bump the version whenever parsing changes
+# so stale caches are discarded.
+_CACHE_FILE_NAME = ".sqldg_cache.json"
+_CACHE_VERSION = 1
+
+
+def _get_dependencies(sql: bytes | mmap.mmap) -> list[Artifact]:
     """
     Params
     ------
-    sql : str
-        Sql to parse to return dependencies.
+    sql : bytes | mmap.mmap
+        Raw sql to parse to return dependencies. Only the artifact names are
+        decoded, as UTF-8.
 
     Returns
     -------
     : list[Artifact]
         Dependencies.
     """
-    # Note: supports only artifacts surrounded by " or `. Most warehouses
-    # support one of these.
-    dependency_regex = r'(?i)\b(?:FROM|TABLE|INTO|JOIN|UPDATE|DELETE)\s+[`"](.*?)[`"]'
-    return list(set(re.findall(dependency_regex, sql)))
+    return [dependency.decode() for dependency in set(_DEPENDENCY_RE.findall(sql))]
+
+
+def _read_dependencies(sql_path: str, size: int) -> list[Artifact]:
+    """
+    Params
+    ------
+    sql_path : str
+        Path to the sql file to parse.
+    size : int
+        Size of the sql file in bytes.
+
+    Returns
+    -------
+    : list[Artifact]
+        Dependencies.
+    """
+    # Unbuffered, so the file is read straight into one bytes object.
+    with open(sql_path, "rb", buffering=0) as file:
+        if _MMAP_MIN_SIZE is None or size < _MMAP_MIN_SIZE:
+            return _get_dependencies(file.read())
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as sql:
+            return _get_dependencies(sql)
+
+
+def _read_cached_dependencies(
+    artifacts: list[Artifact], sql_paths: list[str], dependency_cache: DependencyCache
+) -> list[list[Artifact]]:
+    """
+    Reads a batch of sql files in one task, skipping the files unchanged since
+    they were cached, and caches the dependencies read.
+
+    Params
+    ------
+    artifacts : list[Artifact]
+        Artifact defined in each of `sql_paths`.
+    sql_paths : list[str]
+        Paths to the sql files to parse.
+    dependency_cache : DependencyCache
+        Dependencies parsed on previous runs. Updated in place.
+
+    Returns
+    -------
+    : list[list[Artifact]]
+        Dependencies of each artifact, in order.
+    """
+    all_dependencies: list[list[Artifact]] = []
+    for artifact, sql_path in zip(artifacts, sql_paths):
+        stat = os.stat(sql_path)
+        cached = dependency_cache.get(artifact)
+        if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            all_dependencies.append(cached[2])
+            continue
+        dependencies: list[Artifact] = _read_dependencies(sql_path, stat.st_size)
+        dependency_cache[artifact] = (stat.st_mtime_ns, stat.st_size, dependencies)
+        all_dependencies.append(dependencies)
+    return all_dependencies
+
+
+def _load_dependency_cache(sql_dir: str | Path) -> DependencyCache:
+    """
+    Params
+    ------
+    sql_dir : str | Path
+        Sql directory path.
+
+    Returns
+    -------
+    dependency_cache : DependencyCache
+        Empty if there is no readable cache for the current `_CACHE_VERSION`.
+    """
+    try:
+        with open(os.path.join(sql_dir, _CACHE_FILE_NAME), "rb") as file:
+            cache = json.load(file)
+        if cache["version"] != _CACHE_VERSION:
+            return {}
+        return {
+            artifact: (mtime_ns, size, dependencies)
+            for artifact, (mtime_ns, size, dependencies) in cache["artifacts"].items()
+        }
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as error:
+        log.warning(f"Ignoring unreadable dependency cache: {error}")
+        return {}
+
+
+def _save_dependency_cache(
+    sql_dir: str | Path, dependency_cache: DependencyCache
+) -> None:
+    """
+    Params
+    ------
+    sql_dir : str | Path
+        Sql directory path.
+    dependency_cache : DependencyCache
+        Dependencies to persist for the next run.
+    """
+    cache_path: str = os.path.join(sql_dir, _CACHE_FILE_NAME)
+    # Write then rename, so concurrent runs never read a partial cache.
+    tmp_cache_path = f"{cache_path}.{os.getpid()}"
+    try:
+        with open(tmp_cache_path, "w") as file:
+            json.dump({"version": _CACHE_VERSION, "artifacts": dependency_cache}, file)
+        os.replace(tmp_cache_path, cache_path)
+    except OSError as error:
+        log.warning(f"Could not write the dependency cache: {error}")
+
+
+def _strip_artifact_suffixes(dotted_path: str) -> Artifact:
+    """Drops the `.table` and `.sql` suffixes from a dotted sql file path."""
+    return dotted_path.replace(".table", "").replace(".sql", "")
 
 
 def _convert_path_to_artifact(
@@ -43,52 +200,101 @@ def _convert_path_to_artifact(
     : Artifact
         {schema}.{artifact}
     """
-    sql_dir = Path(sql_dir)
-    artifact_path = Path(artifact_path)
-    paths: list[str] = re.findall(f"{str(sql_dir)}/(.*)", str(artifact_path))
-    if not paths:
+    sql_dir = os.path.normpath(sql_dir)
+    # Paths found under the current directory carry no "./" prefix.
+    sql_dir_prefix: str = "" if sql_dir == os.curdir else sql_dir + os.sep
+    artifact_path = os.path.normpath(artifact_path)
+    if not artifact_path.startswith(sql_dir_prefix):
         raise AssertionError(
             "Check your `artifact_path` and `sql_dir`, not finding the `artifact_path`."
         )
-    return paths[0].replace("/", ".").replace(".table", "").replace(".sql", "")
+    relative_path: str = artifact_path[len(sql_dir_prefix) :]
+    return _strip_artifact_suffixes(relative_path.replace(os.sep, "."))
 
 
-def _get_path_lookup(sql_dir: str) -> dict[Artifact, Path]:
+def _walk_sql_paths(sql_dir: str | Path) -> Iterator[tuple[Artifact, str]]:
+    """
+    Walks `sql_dir` for ".sql" files, naming each artifact while descending.
+
+    Uses `os.scandir` so directory checks come from the listing itself rather
+    than a `stat` per entry. Symlinked directories are not followed, and
+    directories that are missing or unreadable are skipped.
+
+    Params
+    ------
+    sql_dir : str | Path
+        Sql directory path.
+
+    Returns
+    -------
+    : Iterator[tuple[Artifact, str]]
+        {schema}.{artifact} and the path to its sql file.
+    """
+    # Each directory is paired with the "." separated prefix of its artifacts.
+    stack: list[tuple[str | Path, str]] = [(sql_dir, "")]
+    while stack:
+        directory, prefix = stack.pop()
+        try:
+            entries = os.scandir(directory)
+        except (FileNotFoundError, PermissionError):
+            # Skipped like `Path.rglob` does, so a missing `sql_dir` or an
+            # unreadable directory leaves its artifacts out rather than failing.
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((entry.path, f"{prefix}{entry.name}."))
+                elif entry.name.endswith(".sql"):
+                    artifact: Artifact = _strip_artifact_suffixes(
+                        f"{prefix}{entry.name}"
+                    )
+                    yield artifact, entry.path
+
+
+def _get_path_lookup(sql_dir: str | Path) -> dict[Artifact, str]:
     """
     Parameters
     ----------
-    sql_dir : str
+    sql_dir : str | Path
         Sql directory path.
 
     Returns
     -------
-    : Dict[Artifact, Path]
+    : Dict[Artifact, str]
     """
-    sql_paths: list[Path] = list(Path(sql_dir).rglob("*.sql"))
-    path_lookup: dict[Artifact, Path] = {
-        _convert_path_to_artifact(sql_dir, sql_path): sql_path for sql_path in sql_paths
-    }
+    path_lookup: dict[Artifact, str] = dict(_walk_sql_paths(sql_dir))
     return path_lookup
 
 
-def _create_dependency_graph_helper(
-    artifact: Artifact,
-    dependencies: list[Artifact],
-    dependency_graph: DependencyGraph,
-    relationship: str,
-) -> DependencyGraph:
-    if relationship == "parent":
-        for dependency in dependencies:
-            dependency_graph[dependency].append(artifact)
-    elif relationship == "dependency":
-        dependency_graph[artifact] = dependencies
-    else:
-        raise NotImplementedError("")
-    return dependency_graph
+def _map_dependencies(
+    executor: Executor,
+    artifacts: list[Artifact],
+    path_lookup: dict[Artifact, str],
+    dependency_cache: DependencyCache,
+) -> Iterator[list[Artifact]]:
+    """Reads the dependencies of each of `artifacts` on `executor`, in order."""
+    # Small enough batches that every thread still gets work.
+    batch_size: int = max(1, min(_MAX_BATCH_SIZE, -(-len(artifacts) // _MAX_WORKERS)))
+    artifact_batches: list[list[Artifact]] = [
+        artifacts[idx : idx + batch_size]
+        for idx in range(0, len(artifacts), batch_size)
+    ]
+    all_dependency_batches = executor.map(
+        partial(_read_cached_dependencies, dependency_cache=dependency_cache),
+        artifact_batches,
+        [
+            [path_lookup[artifact] for artifact in artifact_batch]
+            for artifact_batch in artifact_batches
+        ],
+    )
+    return chain.from_iterable(all_dependency_batches)
 
 
 def create_dependency_graph(
-    sql_dir: str, relationship: str, root_artifact: Optional[Artifact]
+    sql_dir: str,
+    relationship: str,
+    root_artifact: Optional[Artifact],
+    use_cache: bool = False,
 ) -> dict[Artifact, list[Artifact]]:
     """
     Params
@@ -103,6 +309,10 @@ def create_dependency_graph(
         In other words, this argument is the direction of the relationship.
     root_artifact : Optional[Artifact]
         If supplied, this argument will specify a root node for the subgraph.
+    use_cache : bool
+        If True, only sql files changed since the last run are parsed. Parsed
+        dependencies are cached in `sql_dir`. Off by default, so the library
+        writes nothing into `sql_dir` unless asked to.
 
     Returns
     -------
@@ -113,27 +323,79 @@ def create_dependency_graph(
         "parent",
         "dependency",
     }, '`relationship` must be in {"parent", "dependency"}'
-    if relationship == "parent" and not root_artifact:
+    # Resolved once, so later checks are identity comparisons.
+    relationship = Relationship(relationship)
+    if relationship is Relationship.PARENT and not root_artifact:
         raise NotImplementedError(
             "Must pass a `root_artifact` for the parent relationship."
         )
-    path_lookup: dict[Artifact, Path] = _get_path_lookup(sql_dir)
-    dependency_graph: DependencyGraph = defaultdict(list)
-    artifacts: list[Artifact] = list(path_lookup.keys())
-    for artifact in artifacts:
-        with open(path_lookup[artifact]) as file:
-            sql = file.read()
-        dependencies: list[Artifact] = _get_dependencies(sql)
-        dependency_graph = _create_dependency_graph_helper(
-            artifact, dependencies, dependency_graph, relationship
+    path_lookup: dict[Artifact, str] = _get_path_lookup(sql_dir)
+    loaded_cache: DependencyCache = _load_dependency_cache(sql_dir) if use_cache else {}
+    # Drop artifacts whose sql file no longer exists.
+    dependency_cache: DependencyCache = {
+        artifact: entry
+        for artifact, entry in loaded_cache.items()
+        if artifact in path_lookup
+    }
+    if relationship is Relationship.DEPENDENCY and root_artifact:
+        dependency_graph = _read_dependency_subgraph(
+            path_lookup, root_artifact, dependency_cache
         )
-    if root_artifact:
-        # Note: If performance is an issue, consider creating the subgraph
-        # first.
-        dependency_graph = _create_dependency_subgraph(dependency_graph, root_artifact)
+    else:
+        dependency_graph = _read_dependency_graph(
+            path_lookup, relationship, dependency_cache
+        )
+        if root_artifact:
+            dependency_graph = _create_dependency_subgraph(
+                dependency_graph, root_artifact
+            )
+    if use_cache and dependency_cache != loaded_cache:
+        _save_dependency_cache(sql_dir, dependency_cache)
     return cast(DependencyGraph, dependency_graph)
 
 
+def _read_dependency_graph(
+    path_lookup: dict[Artifact, str],
+    relationship: Relationship,
+    dependency_cache: DependencyCache,
+) -> DependencyGraph:
+    """
+    Builds the full graph by reading every sql file.
+
+    Params
+    ------
+    path_lookup : dict[Artifact, str]
+        Sql file path of each artifact.
+    relationship : Relationship
+        Direction of the relationship.
+    dependency_cache : DependencyCache
+        Dependencies parsed on previous runs. Updated in place.
+
+    Returns
+    -------
+    dependency_graph : DependencyGraph
+        A graph structure of dependencies or parents.
+    """
+    # Parents are reverse edges, so every file must be read to find them.
+    dependency_graph: DependencyGraph = defaultdict(list)
+    artifacts: list[Artifact] = list(path_lookup)
+    # Files are read and parsed concurrently, but the graph is only mutated
+    # here on the main thread.
+    with ThreadPoolExecutor(max_workers=_MAX_WORKERS) as executor:
+        all_dependencies = _map_dependencies(
+            executor, artifacts, path_lookup, dependency_cache
+        )
+        if relationship is Relationship.PARENT:
+            # Bound once, this still creates the list for a new dependency.
+            get_parents = dependency_graph.__getitem__
+            for artifact, dependencies in zip(artifacts, all_dependencies):
+                for dependency in dependencies:
+                    get_parents(dependency).append(artifact)
+        else:
+            dependency_graph.update(zip(artifacts, all_dependencies))
+    return dependency_graph
+
+
 def _create_dependency_subgraph(
     dependency_graph: DependencyGraph, root_artifact: Artifact
 ) -> DependencyGraph:
@@ -150,21 +412,59 @@ def _create_dependency_subgraph(
     dependency_subgraph : DependencyGraph
         Only the artifacts that are a dependency/parent of `root_artifact`
     """
-    lookup_artifacts = {root_artifact}
-    subgraph_artifacts: list[Artifact] = [root_artifact]
-    visited: set = set()
+    dependency_subgraph: DependencyGraph = defaultdict(list)
+    visited: set[Artifact] = set()
+    lookup_artifacts: list[Artifact] = [root_artifact]
     while lookup_artifacts:
         lookup_artifact = lookup_artifacts.pop()
-        if lookup_artifact in dependency_graph.keys():
-            lookup_artifacts.update(set(dependency_graph[lookup_artifact]) - visited)
-            subgraph_artifacts += dependency_graph[lookup_artifact]
-        else:
-            subgraph_artifacts.append(lookup_artifact)
+        if lookup_artifact in visited:
+            continue
         visited.add(lookup_artifact)
-    dependency_dict = {
-        artifact: dependency_graph[artifact]
-        for artifact in subgraph_artifacts
-        if artifact in dependency_graph.keys()
-    }
-    dependency_subgraph: DependencyGraph = defaultdict(list, dependency_dict)
+        if lookup_artifact in dependency_graph:
+            dependency_subgraph[lookup_artifact] = dependency_graph[lookup_artifact]
+            lookup_artifacts.extend(dependency_graph[lookup_artifact])
+    return dependency_subgraph
+
+
+def _read_dependency_subgraph(
+    path_lookup: dict[Artifact, str],
+    root_artifact: Artifact,
+    dependency_cache: DependencyCache,
+) -> DependencyGraph:
+    """
+    Builds the dependency subgraph of `root_artifact` by only reading the sql
+    files reachable from it, one breadth first level at a time.
+
+    Params
+    ------
+    path_lookup : dict[Artifact, str]
+        Sql file path of each artifact.
+    root_artifact : Artifact
+        Artifact you'd like to see dependencies of. {schema}.{artifact}
+    dependency_cache : DependencyCache
+        Dependencies parsed on previous runs. Updated in place.
+
+    Returns
+    -------
+    dependency_subgraph : DependencyGraph
+        Only the artifacts that are a dependency of `root_artifact`
+    """
+    dependency_subgraph: DependencyGraph = defaultdict(list)
+    visited: set[Artifact] = {root_artifact}
+    frontier: list[Artifact] = [root_artifact]
+    with ThreadPoolExecutor(max_workers=_MAX_WORKERS) as executor:
+        while frontier:
+            # Artifacts without a sql file (eg; sources) have no dependencies.
+            frontier = [artifact for artifact in frontier if artifact in path_lookup]
+            all_dependencies = _map_dependencies(
+                executor, frontier, path_lookup, dependency_cache
+            )
+            next_frontier: list[Artifact] = []
+            for artifact, dependencies in zip(frontier, all_dependencies):
+                dependency_subgraph[artifact] = dependencies
+                for dependency in dependencies:
+                    if dependency not in visited:
+                        visited.add(dependency)
+                        next_frontier.append(dependency)
+            frontier = next_frontier
     return dependency_subgraph
@@ -4,20 +4,25 @@ import re
 from typing import Optional, TypeAlias, TypedDict
 
 import click
-import dash
-from dash import html
-import dash_cytoscape as cyto
-import yaml
 
 from sql_dependency_graph.graph import (
     Artifact,
     create_dependency_graph,
     DependencyGraph,
+    Relationship,
 )
 
 log = logging.getLogger(__name__)
 
 DependencyGraphVizElems: TypeAlias = list[dict[str, dict[str, str]]]
+# Compiled pattern and name of each artifact type, in config order.
+ArtifactTypePatterns: TypeAlias = list[tuple[re.Pattern[str], str]]
+# All artifact type patterns combined into one regex, when they can be, along
+# with the patterns themselves. Group `g{idx}` of the combined regex stands for
+# the artifact type at `idx`.
+ArtifactTypeMatcher: TypeAlias = tuple[Optional[re.Pattern[str]], ArtifactTypePatterns]
+# A leading inline flag group such as `(?i)`, which applies to the whole regex.
+_INLINE_GLOBAL_FLAGS: re.Pattern[str] = re.compile(r"\(\?[aiLmsux]+\)")
 
 
 class ArtifactType(TypedDict):
@@ -33,6 +38,9 @@ class GraphConfig(TypedDict):
 
 def _load_graph_config(config_path: Path | str) -> GraphConfig:
     """Load artifact types from a YAML config file and validate them."""
+    # Imported here to keep cli startup fast.
+    import yaml
+
     config_path = Path(config_path)
     with open(config_path, "r") as file:
         config: GraphConfig = yaml.safe_load(file)
@@ -68,16 +76,70 @@ def _validate_graph_config(config: GraphConfig) -> None:
                 )
 
 
+def _compile_artifact_types(
+    artifact_types: list[ArtifactType],
+) -> ArtifactTypeMatcher:
+    """
+    Compile the artifact type patterns once, and combine them into one regex
+    so each artifact is matched with a single search rather than one per
+    artifact type.
+
+    Every alternative is a lookahead anchored at the start of the artifact, so
+    the first artifact type in config order whose pattern is found anywhere
+    wins, same as searching each pattern in turn. Patterns with groups
+    (whose backreferences would be renumbered) or inline global flags (which
+    are only allowed at the start of a regex) are not combined, and are
+    searched in turn.
+    """
+    artifact_type_patterns: ArtifactTypePatterns = []
+    for artifact_type in artifact_types:
+        try:
+            pattern = re.compile(artifact_type["pattern"], re.IGNORECASE)
+        except re.error as error:
+            raise ValueError(
+                f"Invalid pattern for artifact type '{artifact_type['name']}': {error}"
+            ) from error
+        artifact_type_patterns.append((pattern, artifact_type["name"]))
+
+    default_flags: int = re.compile("", re.IGNORECASE).flags
+    if not artifact_type_patterns or any(
+        pattern.groups
+        or pattern.flags != default_flags
+        or _INLINE_GLOBAL_FLAGS.match(pattern.pattern)
+        for pattern, _ in artifact_type_patterns
+    ):
+        return None, artifact_type_patterns
+
+    alternatives: list[str] = [
+        f"(?=(?s:.*?)(?:{pattern.pattern}))(?P<g{idx}>)"
+        for idx, (pattern, _) in enumerate(artifact_type_patterns)
+    ]
+    try:
+        artifact_type_pattern = re.compile("|".join(alternatives), re.IGNORECASE)
+    except re.error:
+        return None, artifact_type_patterns
+    return artifact_type_pattern, artifact_type_patterns
+
+
 def _identify_artifact_type(
-    artifact: str, root_artifact: Optional[str], artifact_types: list[ArtifactType]
+    artifact: str,
+    root_artifact: Optional[str],
+    artifact_type_matcher: ArtifactTypeMatcher,
 ) -> str:
     """Determine the artifact type based on regex patterns loaded from the config."""
     if root_artifact == artifact:
         return "root"
 
-    for artifact_type in artifact_types:
-        if re.search(artifact_type["pattern"], artifact, re.IGNORECASE):
-            return artifact_type["name"]
+    artifact_type_pattern, artifact_type_patterns = artifact_type_matcher
+    if artifact_type_pattern:
+        match = artifact_type_pattern.match(artifact)
+        if match:
+            return artifact_type_patterns[int(match.lastgroup[1:])][1]
+        return "other"
+
+    for pattern, artifact_type_name in artifact_type_patterns:
+        if pattern.search(artifact):
+            return artifact_type_name
 
     return "other"
 
@@ -86,10 +148,9 @@ def _get_unique_artifacts(dependency_graph: DependencyGraph) -> list[Artifact]:
     """
     Gets all artifacts associated with a DependencyGraph.
     """
-    dependencies: list[Artifact] = [
-        artifact for artifacts in dependency_graph.values() for artifact in artifacts
-    ]
-    unique_artifacts = set(dependencies) | set(dependency_graph.keys())
+    unique_artifacts: set[Artifact] = set(dependency_graph)
+    for dependencies in dependency_graph.values():
+        unique_artifacts.update(dependencies)
     return list(unique_artifacts)
 
 
@@ -116,24 +177,27 @@ def _create_dependency_viz_elements(
     dependency_graph_viz_elems : DependencyGraphVizElems
         Structure needed in Dash Cytoscape.
     """
-    dependency_graph_viz_elems = []
     artifacts: list[Artifact] = _get_unique_artifacts(dependency_graph)
-    for artifact in artifacts:
-        artifact_type = _identify_artifact_type(artifact, root_artifact, artifact_types)
-        dependency_graph_viz_elems.append(
-            {
-                "data": {
-                    "id": f"{artifact}",
-                    "label": f"{artifact}",
-                    "artifact_type": f"{artifact_type}",
-                }
+    artifact_type_matcher: ArtifactTypeMatcher = _compile_artifact_types(artifact_types)
+    # Artifacts are already str, so they are used as is rather than formatted.
+    nodes: DependencyGraphVizElems = [
+        {
+            "data": {
+                "id": artifact,
+                "label": artifact,
+                "artifact_type": _identify_artifact_type(
+                    artifact, root_artifact, artifact_type_matcher
+                ),
             }
-        )
-        if artifact in dependency_graph.keys():
-            for dependency in dependency_graph[artifact]:
-                dependency_graph_viz_elems.append(
-                    {"data": {"source": f"{artifact}", "target": f"{dependency}"}}
-                )
+        }
+        for artifact in artifacts
+    ]
+    edges: DependencyGraphVizElems = [
+        {"data": {"source": artifact, "target": dependency}}
+        for artifact, dependencies in dependency_graph.items()
+        for dependency in dependencies
+    ]
+    dependency_graph_viz_elems: DependencyGraphVizElems = nodes + edges
     return dependency_graph_viz_elems
 
 
@@ -174,7 +238,8 @@ def _get_config_settings(
         `root_artifact` as a dependency, ie; parent.
         "dependency" will display all of the dependencies of the `root_artifact`.
         """,
-    default="dependency",
+    type=click.Choice([relationship.value for relationship in Relationship]),
+    default=Relationship.DEPENDENCY.value,
 )
 @click.option(
     "--root_artifact",
@@ -194,12 +259,19 @@ def _get_config_settings(
     help="""Path to the config file. See README for options.""",
     default=None,
 )
+@click.option(
+    "--use_cache/--no_cache",
+    help="""Only re-parse sql files changed since the last run. Parsed
+        dependencies are cached in `sql_dir`. Default is --use_cache.""",
+    default=True,
+)
 def viz(
     sql_dir: str,
     relationship: str,
     root_artifact: Optional[str],
     graph_type: str,
     config_path: Optional[Path | str],
+    use_cache: bool,
 ):
     """
     Displays dependencies as a graph structure in your browswer.
@@ -252,7 +324,6 @@ def viz(
 
     Will show a subgraph of "{project}.{dataset}.{table}" parents.
     """
-    assert relationship in {"parent", "dependency"}
     if config_path:
         config_path = Path(config_path)
         config: GraphConfig = _load_graph_config(config_path)
@@ -260,8 +331,12 @@ def viz(
     else:
         artifact_types = []
     dependency_graph: DependencyGraph = create_dependency_graph(
-        sql_dir, relationship, root_artifact
+        sql_dir, relationship, root_artifact, use_cache=use_cache
     )
+    if not dependency_graph:
+        # Nothing to draw, so don't import dash or start the server.
+        log.warning(f"No {relationship} graph found in {sql_dir}, nothing to display.")
+        return
     dependency_graph_viz_elems: DependencyGraphVizElems = (
         _create_dependency_viz_elements(
             dependency_graph, artifact_types, root_artifact=root_artifact
@@ -272,11 +347,16 @@ def viz(
             graph_type = "breadthfirst"
         else:
             graph_type = "concentric"
-    if relationship == "parent":
+    if relationship == Relationship.PARENT:
         edge_color = "#FFA500"
     else:
         edge_color = "#C5D3E2"
 
+    # Imported here, since dash alone adds ~0.35s to every cli startup.
+    import dash
+    from dash import html
+    import dash_cytoscape as cyto
+
     # See https://dash.plotly.com/cytoscape for details.
     app = dash.Dash(__name__)
     app.layout = html.Div(
@@ -36,8 +36,10 @@ def test_get_dependencies():
         uPDate `{fake_dependencies[2]}`
         ads into "{fake_dependencies[5]}"
         """
-    found_dependencies: list[Artifact] = _get_dependencies(sql)
+    found_dependencies: list[Artifact] = _get_dependencies(sql.encode())
     assert set(fake_dependencies) == set(found_dependencies)
+    # Artifact references do not span lines.
+    assert _get_dependencies(b"from `unclosed\njoin `closed`") == ["closed"]
 
 
 def test_convert_path_to_artifact():
@@ -51,6 +53,12 @@ def test_convert_path_to_artifact():
     fake_path: Path = Path(f"{sql_dir}/master_tables/customer.table.sql")
     view: Artifact = _convert_path_to_artifact(sql_dir, fake_path)
     assert view == "master_tables.customer"
+    view: Artifact = _convert_path_to_artifact(".", "master_views/customer.sql")
+    assert view == "master_views.customer"
+    with pytest.raises(AssertionError):
+        # `sql_dir` is matched literally, not as a regex.
+        fake_path: Path = Path("tests/x.test_data/master_views/customer.sql")
+        view: Artifact = _convert_path_to_artifact(sql_dir, fake_path)
     with pytest.raises(AssertionError):
         fake_path: Path = Path("master_views/customer.sql")
         view: Artifact = _convert_path_to_artifact(sql_dir, fake_path)
@@ -61,9 +69,12 @@ def test_convert_path_to_artifact():
 
 def test_get_path_lookup():
     """"""
-    from sql_dependency_graph.graph import _get_path_lookup
+    from sql_dependency_graph.graph import _convert_path_to_artifact, _get_path_lookup
 
-    views_paths: Dict[Artifact, Path] = _get_path_lookup(Path("tests/.test_data"))
+    views_paths: Dict[Artifact, str] = _get_path_lookup(Path("tests/.test_data"))
+    # The walk names artifacts the same way as `_convert_path_to_artifact`.
+    for artifact, path in views_paths.items():
+        assert _convert_path_to_artifact("tests/.test_data", path) == artifact
     assert set(views_paths.keys()) == set(
         [
             "master_views.customer",
@@ -75,13 +86,33 @@ def test_get_path_lookup():
     assert views_paths.values()
     for path in views_paths.values():
         assert os.path.exists(path)
+    assert _get_path_lookup("tests/.missing_test_data") == {}
+
+
+def test_get_path_lookup_unreadable_directory(monkeypatch):
+    """Unreadable directories are skipped rather than failing the walk."""
+    from sql_dependency_graph.graph import _get_path_lookup
+
+    scandir = os.scandir
+    unreadable_dir: str = os.path.join("tests/.test_data", "master_tables")
+
+    def _scandir(path):
+        if os.path.normpath(path) == os.path.normpath(unreadable_dir):
+            raise PermissionError(path)
+        return scandir(path)
+
+    monkeypatch.setattr(os, "scandir", _scandir)
+    views_paths: Dict[Artifact, str] = _get_path_lookup("tests/.test_data")
+    assert set(views_paths.keys()) == {"master_views.customer", "master_views.package"}
 
 
 def test_identify_artifact_type():
     """"""
     from sql_dependency_graph.viz import (
         ArtifactType,
+        ArtifactTypeMatcher,
         GraphConfig,
+        _compile_artifact_types,
         _identify_artifact_type,
         _load_graph_config,
     )
@@ -90,20 +121,55 @@ def test_identify_artifact_type():
     config_path = Path(config_path)
     config: GraphConfig = _load_graph_config(config_path)
     artifact_types: list[ArtifactType] = config["artifact_types"]
+    artifact_type_matcher: ArtifactTypeMatcher = _compile_artifact_types(artifact_types)
     assert (
-        _identify_artifact_type("nextgen_liveprod.test", None, artifact_types)
+        _identify_artifact_type("nextgen_liveprod.test", None, artifact_type_matcher)
         == "source"
     )
     assert (
-        _identify_artifact_type("google_sheet.FBA Skus", None, artifact_types)
+        _identify_artifact_type("google_sheet.FBA Skus", None, artifact_type_matcher)
         == "google sheet"
     )
     assert (
-        _identify_artifact_type("databricks.some nonsense", None, artifact_types)
+        _identify_artifact_type("databricks.some nonsense", None, artifact_type_matcher)
         == "databricks"
     )
-    assert _identify_artifact_type("cat", "cat", artifact_types) == "root"
-    assert _identify_artifact_type("", "cat", []) == "other"
+    assert _identify_artifact_type("cat", "cat", artifact_type_matcher) == "root"
+    # The first artifact type in the config wins, wherever it matches.
+    assert (
+        _identify_artifact_type("databricks.nextgen", None, artifact_type_matcher)
+        == "source"
+    )
+    assert _identify_artifact_type("", "cat", _compile_artifact_types([])) == "other"
+    # Patterns with groups or inline flags are searched one at a time.
+    grouped_artifact_types: list[ArtifactType] = [
+        {"name": "aa", "pattern": "(a)\\1", "color": "red", "shape": "ellipse"},
+        {"name": "bb", "pattern": "(b)\\1", "color": "blue", "shape": "ellipse"},
+    ]
+    grouped_matcher: ArtifactTypeMatcher = _compile_artifact_types(
+        grouped_artifact_types
+    )
+    assert _identify_artifact_type("bb", None, grouped_matcher) == "bb"
+    assert _identify_artifact_type("ab", None, grouped_matcher) == "other"
+    flagged_artifact_types: list[ArtifactType] = [
+        {"name": "raw", "pattern": "(?i)^raw", "color": "green", "shape": "ellipse"},
+        {"name": "src", "pattern": "src", "color": "red", "shape": "ellipse"},
+    ]
+    flagged_matcher: ArtifactTypeMatcher = _compile_artifact_types(
+        flagged_artifact_types
+    )
+    assert _identify_artifact_type("RAW.events", None, flagged_matcher) == "raw"
+    assert _identify_artifact_type("src.raw", None, flagged_matcher) == "src"
+    # `.` in a pattern does not match a newline, same as searching it alone.
+    dotted_matcher: ArtifactTypeMatcher = _compile_artifact_types(
+        [{"name": "ab", "pattern": "a.b", "color": "red", "shape": "ellipse"}]
+    )
+    assert _identify_artifact_type("a\nb", None, dotted_matcher) == "other"
+    assert _identify_artifact_type("x\na_b", None, dotted_matcher) == "ab"
+    with pytest.raises(ValueError, match="'broken'"):
+        _compile_artifact_types(
+            [{"name": "broken", "pattern": "(", "color": "red", "shape": "ellipse"}]
+        )
     # TODO
     pass
 
@@ -115,7 +181,7 @@ def test_create_dependency_graph_1():
 
     sql_dir = Path("tests/.test_data")
     dependency_graph: DependencyGraph = create_dependency_graph(
-        sql_dir, "dependency", root_artifact=None
+        sql_dir, "dependency", root_artifact=None, use_cache=False
     )
     assert _dependency_graph_vals_to_set(dependency_graph) == {
         "master_views.customer": set(
@@ -137,11 +203,92 @@ def test_create_dependency_graph_2():
 
     sql_dir = Path("tests/.test_data")
     dependency_graph: DependencyGraph = create_dependency_graph(
-        sql_dir, "parent", root_artifact="master_tables.package"
+        sql_dir, "parent", root_artifact="master_tables.package", use_cache=False
     )
     assert _dependency_graph_vals_to_set(dependency_graph) == {
         "master_tables.package": {"master_views.customer"}
     }
+    with pytest.raises(AssertionError):
+        create_dependency_graph(sql_dir, "child", root_artifact=None, use_cache=False)
+
+
+def test_create_dependency_graph_3():
+    from sql_dependency_graph.graph import (
+        create_dependency_graph,
+    )
+
+    sql_dir = Path("tests/.test_data")
+    dependency_graph: DependencyGraph = create_dependency_graph(
+        sql_dir, "dependency", root_artifact="master_views.customer", use_cache=False
+    )
+    assert _dependency_graph_vals_to_set(dependency_graph) == {
+        "master_views.customer": set(
+            [
+                "master_tables.subscription",
+                "master_tables.package",
+            ]
+        ),
+        "master_tables.package": set([]),
+    }
+    dependency_graph: DependencyGraph = create_dependency_graph(
+        sql_dir, "dependency", root_artifact="nexgen_liveprod.test", use_cache=False
+    )
+    assert _dependency_graph_vals_to_set(dependency_graph) == {}
+
+
+def test_dependency_cache(tmp_path, monkeypatch):
+    from sql_dependency_graph import graph
+
+    sql_path = tmp_path / "master_views" / "customer.sql"
+    sql_path.parent.mkdir()
+    sql_path.write_text("from `master_tables.customer`")
+    dependency_graph: DependencyGraph = graph.create_dependency_graph(
+        tmp_path, "dependency", root_artifact=None
+    )
+    assert dependency_graph == {"master_views.customer": ["master_tables.customer"]}
+    # The library only caches when asked to.
+    assert not (tmp_path / graph._CACHE_FILE_NAME).exists()
+    assert (
+        graph.create_dependency_graph(
+            tmp_path, "dependency", root_artifact=None, use_cache=True
+        )
+        == dependency_graph
+    )
+    assert (tmp_path / graph._CACHE_FILE_NAME).exists()
+
+    def _read_dependencies(sql_path, size):
+        raise AssertionError("Unchanged sql files should not be read.")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(graph, "_read_dependencies", _read_dependencies)
+        assert (
+            graph.create_dependency_graph(
+                tmp_path, "dependency", root_artifact=None, use_cache=True
+            )
+            == dependency_graph
+        )
+    sql_path.write_text("from `master_tables.subscription`")
+    assert graph.create_dependency_graph(
+        tmp_path, "dependency", root_artifact=None, use_cache=True
+    ) == {"master_views.customer": ["master_tables.subscription"]}
+    (tmp_path / graph._CACHE_FILE_NAME).write_text("not json")
+    assert graph.create_dependency_graph(
+        tmp_path, "dependency", root_artifact=None, use_cache=True
+    ) == {"master_views.customer": ["master_tables.subscription"]}
+
+
+def test_read_dependencies_mmap(tmp_path, monkeypatch):
+    from sql_dependency_graph import graph
+
+    if graph._MMAP_MIN_SIZE is None:
+        pytest.skip("re2 cannot scan a memory mapped sql file.")
+    sql_path = tmp_path / "customer.sql"
+    sql_path.write_text("from `master_tables.customer`")
+    # Memory map even the smallest sql file.
+    monkeypatch.setattr(graph, "_MMAP_MIN_SIZE", 0)
+    assert graph._read_dependencies(str(sql_path), sql_path.stat().st_size) == [
+        "master_tables.customer"
+    ]
 
 
 def test_create_dependency_subgraph():
@@ -152,7 +299,7 @@ def test_create_dependency_subgraph():
 
     sql_dir = Path("tests/.test_data")
     dependency_graph: DependencyGraph = create_dependency_graph(
-        sql_dir, "dependency", root_artifact=None
+        sql_dir, "dependency", root_artifact=None, use_cache=False
     )
     dependency_subgraph: DependencyGraph = _create_dependency_subgraph(
         dependency_graph, "master_views.customer"
@@ -188,3 +335,37 @@ def test_get_unique_artifacts():
     ]
     unique_artifacts: list[Artifact] = _get_unique_artifacts(dependency_graph)
     assert set(unique_artifacts_test) == set(unique_artifacts)
+
+
+def test_create_dependency_viz_elements():
+    from sql_dependency_graph.viz import _create_dependency_viz_elements
+
+    dependency_graph: DependencyGraph = {
+        "master_views.customer": [
+            "master_tables.subscription",
+            "master_tables.package",
+        ],
+        "master_tables.package": [],
+    }
+    viz_elems = _create_dependency_viz_elements(
+        dependency_graph, [], root_artifact="master_views.customer"
+    )
+    nodes = {
+        elem["data"]["id"]: elem["data"]["artifact_type"]
+        for elem in viz_elems
+        if "id" in elem["data"]
+    }
+    edges = {
+        (elem["data"]["source"], elem["data"]["target"])
+        for elem in viz_elems
+        if "source" in elem["data"]
+    }
+    assert nodes == {
+        "master_views.customer": "root",
+        "master_tables.subscription": "other",
+        "master_tables.package": "other",
+    }
+    assert edges == {
+        ("master_views.customer", "master_tables.subscription"),
+        ("master_views.customer", "master_tables.package"),
+    }